@@ -1,14 +1,31 @@
 import argparse
 import base64
+import contextlib
 import fnmatch
 import getpass
+import os
+import re
 import shlex
 import socket
 import sys
 import tkinter as tk
+from operator import attrgetter
 from pathlib import Path
 from tkinter import scrolledtext
-import xml.etree.ElementTree as ET
+from typing import Callable
+
+try:
+    # lxml (libxml2) разбирает большие XML заметно быстрее; API совместим с ElementTree
+    from lxml import etree as ET
+    # lxml хранит комментарии и PI как узлы и обрезает по ним el.text;
+    # удаляем их, чтобы содержимое файлов совпадало с ElementTree
+    _ITERPARSE_OPTIONS: dict = {"huge_tree": True, "remove_comments": True, "remove_pis": True}
+except ImportError:
+    import xml.etree.ElementTree as ET
+    _ITERPARSE_OPTIONS = {}
+
+# Значения атрибута base64, означающие «содержимое закодировано»
+_TRUE = frozenset(("1", "true", "yes"))
 
 
 # =========================
@@ -16,32 +33,60 @@ import xml.etree.ElementTree as ET
 # =========================
 
 class VNode:
+    # __slots__: узлов в VFS может быть много, словарь атрибутов на каждый не нужен
+    __slots__ = ("name", "name_ci", "parent", "_abspath")
+
     def __init__(self, name: str, parent: 'VDir | None'):
         self.name = name
+        # Имя в нижнем регистре — ключ сортировки без учёта регистра, считается один раз
+        self.name_ci = name.lower()
         self.parent = parent
+        # Кэш abspath(). Узлы VFS никогда не переносятся к другому родителю
+        # (cp создаёт новые узлы), поэтому сбрасывать кэш не требуется.
+        self._abspath: str | None = None
 
     def abspath(self) -> str:
-        # Корень
-        if self.parent is None:
-            return "/"
-        parts = []
-        cur: VNode | None = self
-        while cur and cur.parent is not None:
-            parts.append(cur.name)
+        if self._abspath is not None:
+            return self._abspath
+        # Сначала глубина, затем имена с конца в список нужного размера
+        # (для корня depth == 0 и результат — "/")
+        depth = 0
+        cur: VNode = self
+        while cur.parent is not None:
+            depth += 1
             cur = cur.parent
-        return "/" + "/".join(reversed(parts))
+        parts = [""] * depth
+        cur = self
+        i = depth - 1
+        while i >= 0:
+            parts[i] = cur.name
+            cur = cur.parent  # type: ignore[assignment]
+            i -= 1
+        self._abspath = "/" + "/".join(parts)
+        return self._abspath
+
+
+_BY_NAME_CI = attrgetter("name_ci")
 
 
 class VFile(VNode):
+    # content — неизменяемые bytes; копии файлов (cp) разделяют один и тот же объект
+    __slots__ = ("content",)
+
     def __init__(self, name: str, content: bytes, parent: 'VDir'):
         super().__init__(name, parent)
         self.content = content
 
 
 class VDir(VNode):
+    __slots__ = ("children", "_sorted_children", "_names_cache")
+
     def __init__(self, name: str, parent: 'VDir | None' = None):
         super().__init__(name, parent)
         self.children: dict[str, VNode] = {}
+        # Кэши порядка детей (для обхода и для ls); сбрасываются при добавлении узлов
+        self._sorted_children: tuple[VNode, ...] | None = None
+        self._names_cache: tuple[str, ...] | None = None
 
     def get(self, name: str) -> 'VNode | None':
         return self.children.get(name)
@@ -54,6 +99,7 @@ class VDir(VNode):
             return d
         d = VDir(name, self)
         self.children[name] = d
+        self._children_changed()
         return d
 
     def add_file(self, name: str, content: bytes) -> 'VFile':
@@ -61,16 +107,26 @@ class VDir(VNode):
             raise ValueError(f"в VFS уже есть каталог с именем '{name}'")
         f = VFile(name, content, self)
         self.children[name] = f
+        # Сбрасываем кэши и при перезаписи: в отсортированном кортеже лежат сами узлы
+        self._children_changed()
         return f
 
-    def list_names(self) -> list[str]:
-        names = []
-        for n, node in self.children.items():
-            if isinstance(node, VDir):
-                names.append(n + "/")
-            else:
-                names.append(n)
-        names.sort(key=lambda s: s.lower())
+    def _children_changed(self) -> None:
+        self._sorted_children = None
+        self._names_cache = None
+
+    def sorted_children(self) -> tuple[VNode, ...]:
+        nodes = self._sorted_children
+        if nodes is None:
+            nodes = self._sorted_children = tuple(sorted(self.children.values(), key=_BY_NAME_CI))
+        return nodes
+
+    def list_names(self) -> tuple[str, ...]:
+        names = self._names_cache
+        if names is None:
+            listing = [n + "/" if isinstance(node, VDir) else n for n, node in self.children.items()]
+            listing.sort(key=str.lower)
+            names = self._names_cache = tuple(listing)
         return names
 
 
@@ -80,18 +136,34 @@ def _import_physical_dir_to_vfs(dir_path: Path) -> VDir:
     в ОЗУ (ничего на диске не меняем).
     """
     root = VDir("/")
-    def walk(host_dir: Path, vdir: VDir):
-        for entry in sorted(host_dir.iterdir(), key=lambda p: p.name.lower()):
+    # Обход без рекурсии: стек троек (каталог на диске, каталог VFS,
+    # (st_dev, st_ino) каталогов на пути от корня).
+    # os.scandir отдаёт тип записи из readdir, без отдельного stat на каждую;
+    # stat нужен только каталогам (и ссылкам — чтобы узнать, куда они ведут).
+    st = os.stat(dir_path)
+    stack: list[tuple[str, VDir, frozenset[tuple[int, int]]]] = [
+        (str(dir_path), root, frozenset(((st.st_dev, st.st_ino),)))
+    ]
+    while stack:
+        host_dir, vdir, ancestors = stack.pop()
+        with os.scandir(host_dir) as it:
+            entries = sorted(it, key=lambda e: e.name.lower())
+        for entry in entries:
             if entry.is_dir():
                 child = vdir.add_dir(entry.name)
-                walk(entry, child)
+                st = entry.stat()
+                key = (st.st_dev, st.st_ino)
+                # Ссылка на каталог выше по пути дала бы бесконечный цикл:
+                # такой каталог добавляем, но внутрь не заходим
+                if key not in ancestors:
+                    stack.append((entry.path, child, ancestors | {key}))
             else:
                 try:
-                    data = entry.read_bytes()
+                    with open(entry.path, "rb") as fh:
+                        data = fh.read()
                 except Exception:
                     data = b""
                 vdir.add_file(entry.name, data)
-    walk(dir_path, root)
     return root
 
 
@@ -111,54 +183,80 @@ def load_vfs_from_xml(xml_path: Path) -> VDir:
     if not xml_path.exists():
         raise FileNotFoundError(f"файл '{xml_path}' не найден")
 
+    # Потоковый разбор: DOM целиком не строим, закрытые элементы сразу очищаем.
+    # stack — по одному элементу на каждый открытый тег внутри <vfs>:
+    # VDir для каталогов VFS, None для игнорируемых веток.
+    root: VDir | None = None
+    stack: list[VDir | None] = []
+    level = 0
     try:
-        tree = ET.parse(xml_path)
+        for event, el in ET.iterparse(
+            str(xml_path), events=("start", "end"), **_ITERPARSE_OPTIONS
+        ):
+            if event == "start":
+                if level == 0:
+                    if el.tag != "vfs":
+                        raise ValueError("ожидался корневой тег <vfs>")
+                elif level == 1:
+                    if root is None and el.tag == "dir" and el.get("name") == "/":
+                        root = VDir("/")
+                        stack.append(root)
+                    else:
+                        stack.append(None)
+                else:
+                    parent = stack[-1]
+                    if parent is not None and el.tag == "dir":
+                        name = el.get("name")
+                        if not name:
+                            raise ValueError("в <dir> отсутствует атрибут 'name'")
+                        stack.append(parent.add_dir(name))
+                    else:
+                        # неизвестные теги (и всё внутри них) просто игнорируем
+                        stack.append(None)
+                level += 1
+                continue
+
+            level -= 1
+            if level == 0:
+                continue
+            stack.pop()
+            if el.tag == "file" and level >= 2 and stack[-1] is not None:
+                name, data = _read_file_element(el)
+                stack[-1].add_file(name, data)
+            el.clear()
     except ET.ParseError as e:
         raise ValueError(f"некорректный XML: {e}") from e
 
-    root_el = tree.getroot()
-    if root_el.tag != "vfs":
-        raise ValueError("ожидался корневой тег <vfs>")
-
-    dirs = [el for el in root_el.findall("dir") if el.get("name") == "/"]
-    if not dirs:
+    if root is None:
         raise ValueError("в <vfs> отсутствует <dir name=\"/\">")
-    top_el = dirs[0]
-
-    root = VDir("/")
-    _build_dir_from_xml(top_el, root)
     return root
 
 
-def _build_dir_from_xml(dir_el: ET.Element, vdir: VDir) -> None:
-    for child in dir_el:
-        if child.tag == "dir":
-            name = child.get("name")
-            if not name:
-                raise ValueError("в <dir> отсутствует атрибут 'name'")
-            new_dir = vdir.add_dir(name)
-            _build_dir_from_xml(child, new_dir)
-        elif child.tag == "file":
-            name = child.get("name")
-            if not name:
-                raise ValueError("в <file> отсутствует атрибут 'name'")
-            is_b64 = (child.get("base64", "false").lower() in ("1", "true", "yes"))
-            encoding = child.get("encoding")
-            text = child.text or ""
-            try:
-                if is_b64:
-                    data = base64.b64decode(text.encode("ascii"), validate=True)
-                else:
-                    if encoding:
-                        data = text.encode(encoding)
-                    else:
-                        data = text.encode("utf-8")
-            except Exception as e:
-                raise ValueError(f"ошибка чтения содержимого файла '{name}': {e}") from e
-            vdir.add_file(name, data)
+def _read_file_element(file_el: ET.Element) -> tuple[str, bytes]:
+    name = file_el.get("name")
+    if not name:
+        raise ValueError("в <file> отсутствует атрибут 'name'")
+    is_b64 = file_el.get("base64", "false").lower() in _TRUE
+    text = file_el.text or ""
+    try:
+        if is_b64:
+            # b64decode принимает ASCII-строку напрямую, без промежуточных bytes
+            data = base64.b64decode(text, validate=True)
         else:
-            # неизвестные теги просто игнорируем, чтобы не падать
-            continue
+            data = text.encode(file_el.get("encoding") or "utf-8")
+    except Exception as e:
+        raise ValueError(f"ошибка чтения содержимого файла '{name}': {e}") from e
+    return name, data
+
+
+def _split_path(path_str: str) -> list[str]:
+    """
+    Компоненты пути без пустых частей (лишние и концевые слеши отбрасываются).
+    """
+    if "//" in path_str:
+        return [p for p in path_str.split("/") if p]
+    stripped = path_str.strip("/")
+    return stripped.split("/") if stripped else []
 
 
 def _resolve_in_vfs(start: VNode, a_root: VDir, path_str: str | None) -> VNode:
@@ -171,13 +269,8 @@ def _resolve_in_vfs(start: VNode, a_root: VDir, path_str: str | None) -> VNode:
     if path_str is None or path_str == ".":
         return start
 
-    cur: VNode
-    if path_str.startswith("/"):
-        cur = a_root
-        parts = [p for p in path_str.split("/") if p]
-    else:
-        cur = start
-        parts = [p for p in path_str.split("/") if p]
+    cur: VNode = a_root if path_str.startswith("/") else start
+    parts = _split_path(path_str)
 
     for part in parts:
         if part == ".":
@@ -205,13 +298,17 @@ def _walk_vfs(start: VNode, *, maxdepth: int | None = None):
     depth=0 для стартового узла; ограничение maxdepth включительно.
     """
     stack: list[tuple[VNode, int]] = [(start, 0)]
+    # Методы стека — в локальные имена: цикл выполняется для каждого узла
+    push = stack.append
+    pop = stack.pop
     while stack:
-        node, depth = stack.pop()
+        node, depth = pop()
         yield node, depth
         if isinstance(node, VDir):
             if (maxdepth is None) or (depth < maxdepth):
-                for name in sorted(node.children.keys(), key=str.lower, reverse=True):
-                    stack.append((node.children[name], depth + 1))
+                child_depth = depth + 1
+                for child in reversed(node.sorted_children()):
+                    push((child, child_depth))
 
 
 def _resolve_parent_for_creation(start: VNode, a_root: VDir, path_str: str) -> tuple[VDir, str]:
@@ -228,12 +325,8 @@ def _resolve_parent_for_creation(start: VNode, a_root: VDir, path_str: str) -> t
         raise ValueError("нельзя создавать объект с именем '/'")
 
     # Выделяем имя и путь к родителю
-    if path_str.startswith("/"):
-        cur: VNode = a_root
-        parts = [p for p in path_str.split("/") if p]
-    else:
-        cur = start
-        parts = [p for p in path_str.split("/") if p]
+    cur: VNode = a_root if path_str.startswith("/") else start
+    parts = _split_path(path_str)
 
     if not parts:
         raise ValueError("неверный путь")
@@ -266,6 +359,48 @@ def _resolve_parent_for_creation(start: VNode, a_root: VDir, path_str: str) -> t
     return cur, name
 
 
+def _resolve_or_parent(start: VNode, a_root: VDir, path_str: str) -> tuple[VNode | None, VDir | None, str]:
+    """
+    Одним проходом по пути определяет, существует ли узел (нужно для cp):
+    - (узел, None, "") — путь существует (правила как в _resolve_in_vfs);
+    - (None, родительский каталог, имя) — узла нет, его можно создать.
+    Редкие и ошибочные случаи передаются _resolve_parent_for_creation,
+    чтобы сообщения об ошибках не отличались.
+    """
+    cur: VNode = a_root if path_str.startswith("/") else start
+    parts = _split_path(path_str)
+    if not parts:
+        return cur, None, ""
+
+    # в пути к родителю встречались только каталоги (как того требует создание)
+    dirs_only = True
+    for part in parts[:-1]:
+        if part == ".":
+            continue
+        if part == "..":
+            cur = a_root if cur.parent is None else cur.parent
+            continue
+        nxt = cur.get(part) if isinstance(cur, VDir) else None
+        if nxt is None:
+            return (None, *_resolve_parent_for_creation(start, a_root, path_str))
+        if not isinstance(nxt, VDir):
+            dirs_only = False
+        cur = nxt
+
+    name = parts[-1]
+    if name == ".":
+        return cur, None, ""
+    if name == "..":
+        return (a_root if cur.parent is None else cur.parent), None, ""
+    if isinstance(cur, VDir):
+        node = cur.get(name)
+        if node is not None:
+            return node, None, ""
+        if dirs_only:
+            return None, cur, name
+    return (None, *_resolve_parent_for_creation(start, a_root, path_str))
+
+
 def _copy_recursive(src: VNode, dst_parent: VDir, new_name: str) -> None:
     """
     Рекурсивно копирует src в dst_parent/new_name.
@@ -279,25 +414,42 @@ def _copy_recursive(src: VNode, dst_parent: VDir, new_name: str) -> None:
         # Разрешаем перезапись файла
         dst_parent.add_file(new_name, src.content)
         return
-    if isinstance(src, VDir):
-        if existing is not None:
-            # Не позволяем "сливать" каталоги, чтобы логика была простой и предсказуемой
-            raise ValueError(f"цель уже существует: {dst_parent.abspath().rstrip('/')}/{new_name}")
-        new_dir = dst_parent.add_dir(new_name)
-        # Копируем содержимое
-        for child_name, child in sorted(src.children.items(), key=lambda kv: kv[0].lower()):
-            if isinstance(child, VFile):
-                new_dir.add_file(child_name, child.content)
-            else:
-                _copy_recursive(child, new_dir, child_name)
-        return
-    raise ValueError("неизвестный тип узла источника")
+    if not isinstance(src, VDir):
+        raise ValueError("неизвестный тип узла источника")
+    if existing is not None:
+        # Не позволяем "сливать" каталоги, чтобы логика была простой и предсказуемой
+        raise ValueError(f"цель уже существует: {dst_parent.abspath().rstrip('/')}/{new_name}")
+    # Копия каталога внутрь самого себя никогда бы не закончилась
+    cur: VDir | None = dst_parent
+    while cur is not None:
+        if cur is src:
+            raise ValueError(f"нельзя скопировать каталог в самого себя: {src.abspath()}")
+        cur = cur.parent
+
+    # Копируем содержимое без рекурсии: стек пар (исходный каталог, новый каталог)
+    stack: list[tuple[VDir, VDir]] = [(src, dst_parent.add_dir(new_name))]
+    push = stack.append
+    pop = stack.pop
+    file_cls, dir_cls = VFile, VDir
+    while stack:
+        src_dir, new_dir = pop()
+        for child in src_dir.sorted_children():
+            if isinstance(child, file_cls):
+                new_dir.add_file(child.name, child.content)
+            elif isinstance(child, dir_cls):
+                push((child, new_dir.add_dir(child.name)))
 
 
 # =========================
 # GUI-эмулятор оболочки
 # =========================
 
+# Команды, меняющие VFS: после них кэш разрешённых путей недействителен
+_MUTATING_COMMANDS = frozenset(("touch", "cp"))
+# Верхняя граница размера кэша путей
+_RESOLVE_CACHE_LIMIT = 1024
+
+
 class ShellEmulator(tk.Tk):
     def __init__(self, vfs_source: Path | None, script_path: Path | None, raw_args: dict):
         super().__init__()
@@ -315,6 +467,9 @@ class ShellEmulator(tk.Tk):
             self, wrap=tk.WORD, state="disabled", font=("JetBrains Mono", 11)
         )
         self.out.pack(fill=tk.BOTH, expand=True)
+        # Буфер вывода: в пакетном режиме текст копится и вставляется одним insert
+        self._pending: list[str] = []
+        self._batching = False
 
         self.inp = tk.Entry(self, font=("JetBrains Mono", 11))
         self.inp.pack(fill=tk.X, pady=(8, 0))
@@ -331,9 +486,25 @@ class ShellEmulator(tk.Tk):
         self.history: list[str] = []
         self.hist_idx: int | None = None
 
+        # ---- таблица команд: имя -> обработчик ----
+        self._commands: dict[str, Callable[[list[str]], bool]] = {
+            "exit": self._cmd_exit,
+            "help": self._cmd_help,
+            "pwd": self._cmd_pwd,
+            "echo": self._cmd_echo,
+            "uname": self._cmd_uname,
+            "ls": self._cmd_ls,
+            "find": self._cmd_find,
+            "cd": self._cmd_cd,
+            "touch": self._cmd_touch,
+            "cp": self._cmd_cp,
+        }
+
         # ---- VFS (в памяти) ----
         self.vfs_root: VDir
         self.cwd: VDir
+        # (каталог старта, путь) -> узел; только успешные разрешения
+        self._resolve_cache: dict[tuple[VNode, str | None], VNode] = {}
         self.writeln("--- Параметры запуска ---")
         self.writeln(f"VFS      : {str(vfs_source) if vfs_source else '<не задан>'}")
         self.writeln(f"Script   : {str(script_path) if script_path else '<не задан>'}")
@@ -350,13 +521,38 @@ class ShellEmulator(tk.Tk):
 
     # ---------- сервис вывода ----------
     def write(self, text: str):
+        self._pending.append(text)
+        if not self._batching:
+            self._flush()
+
+    def writeln(self, text: str = ""):
+        self.write(text + "\n")
+
+    def _flush(self):
+        if not self._pending:
+            return
+        text = "".join(self._pending)
+        self._pending.clear()
         self.out.configure(state="normal")
         self.out.insert(tk.END, text)
         self.out.see(tk.END)
         self.out.configure(state="disabled")
 
-    def writeln(self, text: str = ""):
-        self.write(text + "\n")
+    @contextlib.contextmanager
+    def _batched_output(self):
+        """
+        Копит весь вывод внутри блока и отправляет его в виджет одним вызовом.
+        Вложенные блоки не сбрасывают буфер раньше внешнего.
+        """
+        if self._batching:
+            yield
+            return
+        self._batching = True
+        try:
+            yield
+        finally:
+            self._batching = False
+            self._flush()
 
     # ---------- история ----------
     def on_history_up(self, _event=None):
@@ -412,6 +608,20 @@ class ShellEmulator(tk.Tk):
 
         self.cwd = self.vfs_root  # начинаем в корне
 
+    def _cached_resolve(self, path_str: str | None) -> VNode:
+        """
+        _resolve_in_vfs относительно текущего каталога с кэшем результатов.
+        Кэш сбрасывается после каждой команды, изменяющей VFS.
+        """
+        key = (self.cwd, path_str)
+        node = self._resolve_cache.get(key)
+        if node is None:
+            node = _resolve_in_vfs(self.cwd, self.vfs_root, path_str)
+            if len(self._resolve_cache) >= _RESOLVE_CACHE_LIMIT:
+                self._resolve_cache.clear()
+            self._resolve_cache[key] = node
+        return node
+
     def _default_vfs(self) -> VDir:
         root = VDir("/")
         etc = root.add_dir("etc")
@@ -426,16 +636,18 @@ class ShellEmulator(tk.Tk):
     def on_enter(self, _event=None):
         line = self.inp.get()
         self.inp.delete(0, tk.END)
-        # эхо команды как в терминале
-        self.writeln(line)
         if line.strip():
             self.history.append(line)
         self.hist_idx = None
 
-        ok = self.process_line(line)
-        # новый промпт
-        if self.winfo_exists():
-            self.write(self.prompt)
+        # эхо, вывод команды и новый промпт уходят в виджет одной вставкой
+        with self._batched_output():
+            # эхо команды как в терминале
+            self.writeln(line)
+            ok = self.process_line(line)
+            # новый промпт
+            if self.winfo_exists():
+                self.write(self.prompt)
         return ok
 
     def process_line(self, line: str, *, echo: bool = False) -> bool:
@@ -454,6 +666,9 @@ class ShellEmulator(tk.Tk):
         except Exception as e:
             self.writeln(f"ошибка выполнения: {e!r}")
             return False
+        finally:
+            if cmd in _MUTATING_COMMANDS:
+                self._resolve_cache.clear()
 
     # ---------- запуск стартового скрипта ----------
     def _run_script_with_ui(self, script_path: Path):
@@ -463,260 +678,270 @@ class ShellEmulator(tk.Tk):
             self.write(self.prompt)
             return
 
-        try:
-            text = sp.read_text(encoding="utf-8")
-        except Exception as e:
-            self.writeln(f"Ошибка чтения скрипта: {e!r}")
-            self.write(self.prompt)
-            return
-
-        stop = False
-        for lineno, raw in enumerate(text.splitlines(), start=1):
-            line = raw.rstrip("\n")
-            stripped = line.strip()
-            if not stripped or stripped.startswith("#"):
-                continue
-
-            self.writeln(f"{self.prompt}{line}")
-
-            ok = self.process_line(line)
-            if not ok:
-                self.writeln(f"Остановка скрипта на строке {lineno}.")
+        # Весь диалог скрипта выводим в виджет одной вставкой
+        with self._batched_output():
+            stop = False
+            try:
+                # Читаем построчно: скрипт целиком в памяти не держим
+                with sp.open(encoding="utf-8") as f:
+                    for lineno, raw in enumerate(f, start=1):
+                        line = raw.rstrip("\n")
+                        stripped = line.strip()
+                        if not stripped or stripped.startswith("#"):
+                            continue
+
+                        self.writeln(f"{self.prompt}{line}")
+
+                        ok = self.process_line(line)
+                        if not ok:
+                            self.writeln(f"Остановка скрипта на строке {lineno}.")
+                            stop = True
+                            break
+            except (OSError, UnicodeDecodeError) as e:
+                self.writeln(f"Ошибка чтения скрипта: {e!r}")
                 stop = True
-                break
 
-        if not stop:
-            self.writeln("(скрипт завершён)")
+            if not stop:
+                self.writeln("(скрипт завершён)")
 
-        if self.winfo_exists():
-            self.write(self.prompt)
+            if self.winfo_exists():
+                self.write(self.prompt)
 
     # ---------- команды ----------
     def dispatch(self, cmd: str, args: list[str]) -> bool:
-        if cmd == "exit":
-            self.writeln("Выход...")
-            self.after(50, self.destroy)
-            return True
+        handler = self._commands.get(cmd)
+        if handler is None:
+            # неизвестная команда — считаем ошибкой (важно для остановки скрипта)
+            self.writeln(f"{cmd}: команда не найдена")
+            return False
+        return handler(args)
+
+    def _cmd_exit(self, args: list[str]) -> bool:
+        self.writeln("Выход...")
+        self.after(50, self.destroy)
+        return True
+
+    def _cmd_help(self, args: list[str]) -> bool:
+        self.writeln(
+            "Доступные команды: help, ls [path], cd [path], pwd, echo ..., "
+            "find [path] [-name PATTERN] [-type f|d] [-maxdepth N], "
+            "uname [-asnrmpo], touch FILE..., cp [-r] SRC DST, exit"
+        )
+        return True
 
-        if cmd == "help":
-            self.writeln(
-                "Доступные команды: help, ls [path], cd [path], pwd, echo ..., "
-                "find [path] [-name PATTERN] [-type f|d] [-maxdepth N], "
-                "uname [-asnrmpo], touch FILE..., cp [-r] SRC DST, exit"
-            )
-            return True
+    def _cmd_pwd(self, args: list[str]) -> bool:
+        self.writeln(self.cwd.abspath())
+        return True
 
-        if cmd == "pwd":
-            self.writeln(self.cwd.abspath())
-            return True
+    def _cmd_echo(self, args: list[str]) -> bool:
+        self.writeln(" ".join(args))
+        return True
 
-        if cmd == "echo":
-            self.writeln(" ".join(args))
+    def _cmd_uname(self, args: list[str]) -> bool:
+        # Минимальная эмуляция uname
+        flags = [a for a in args if a.startswith("-")]
+        if not flags:
+            self.writeln("VFS-Emu")
             return True
-
-        if cmd == "uname":
-            # Минимальная эмуляция uname
-            flags = [a for a in args if a.startswith("-")]
-            if not flags:
-                self.writeln("VFS-Emu")
-                return True
-            if "-a" in flags:
-                self.writeln(f"VFS-Emu {self.hostname} 0.1 x86_64 GNU/Linux")
-                return True
-            out: list[str] = []
-            for fl in flags:
-                if fl == "-s":
-                    out.append("VFS-Emu")
-                elif fl == "-n":
-                    out.append(self.hostname)
-                elif fl == "-r":
-                    out.append("0.1")
-                elif fl in ("-m", "-p"):
-                    out.append("x86_64")
-                elif fl == "-o":
-                    out.append("GNU/Linux")
-                else:
-                    self.writeln(f"uname: неизвестная опция {fl}")
-                    return False
-            self.writeln(" ".join(out))
+        if "-a" in flags:
+            self.writeln(f"VFS-Emu {self.hostname} 0.1 x86_64 GNU/Linux")
             return True
-
-        if cmd == "ls":
-            path = args[0] if args else "."
-            try:
-                target = _resolve_in_vfs(self.cwd, self.vfs_root, path)
-            except (FileNotFoundError, ValueError) as e:
-                self.writeln(f"ls: {e}")
+        out: list[str] = []
+        for fl in flags:
+            if fl == "-s":
+                out.append("VFS-Emu")
+            elif fl == "-n":
+                out.append(self.hostname)
+            elif fl == "-r":
+                out.append("0.1")
+            elif fl in ("-m", "-p"):
+                out.append("x86_64")
+            elif fl == "-o":
+                out.append("GNU/Linux")
+            else:
+                self.writeln(f"uname: неизвестная опция {fl}")
                 return False
+        self.writeln(" ".join(out))
+        return True
 
-            if isinstance(target, VFile):
-                self.writeln(target.name)
-                return True
+    def _cmd_ls(self, args: list[str]) -> bool:
+        path = args[0] if args else "."
+        try:
+            target = self._cached_resolve(path)
+        except (FileNotFoundError, ValueError) as e:
+            self.writeln(f"ls: {e}")
+            return False
 
-            names = target.list_names()
-            self.writeln("  ".join(names))
+        if isinstance(target, VFile):
+            self.writeln(target.name)
             return True
 
-        if cmd == "find":
-            # find [path] [-name PATTERN] [-type f|d] [-maxdepth N]
-            path = "."
-            name_pat: str | None = None
-            type_filter: str | None = None  # 'f' или 'd'
-            maxdepth: int | None = None
-
-            i = 0
-            while i < len(args):
-                a = args[i]
-                if not a.startswith("-") and path == ".":
-                    path = a
-                    i += 1
-                    continue
-                if a == "-name" and i + 1 < len(args):
-                    name_pat = args[i + 1]
-                    i += 2
-                    continue
-                if a == "-type" and i + 1 < len(args):
-                    val = args[i + 1]
-                    if val not in ("f", "d"):
-                        self.writeln("find: -type ожидает f или d")
-                        return False
-                    type_filter = val
-                    i += 2
-                    continue
-                if a == "-maxdepth" and i + 1 < len(args):
-                    try:
-                        maxdepth = int(args[i + 1])
-                        if maxdepth < 0:
-                            raise ValueError
-                    except ValueError:
-                        self.writeln("find: -maxdepth ожидает неотрицательное целое")
-                        return False
-                    i += 2
-                    continue
-                self.writeln(f"find: неизвестная опция или аргумент '{a}'")
-                return False
-
-            try:
-                start_node = _resolve_in_vfs(self.cwd, self.vfs_root, path)
-            except (FileNotFoundError, ValueError) as e:
-                self.writeln(f"find: {e}")
-                return False
-
-            def match(node: VNode) -> bool:
-                if type_filter == "f" and not isinstance(node, VFile):
-                    return False
-                if type_filter == "d" and not isinstance(node, VDir):
+        names = target.list_names()
+        self.writeln("  ".join(names))
+        return True
+
+    def _cmd_find(self, args: list[str]) -> bool:
+        # find [path] [-name PATTERN] [-type f|d] [-maxdepth N]
+        path = "."
+        name_pat: str | None = None
+        type_filter: str | None = None  # 'f' или 'd'
+        maxdepth: int | None = None
+
+        i = 0
+        while i < len(args):
+            a = args[i]
+            if not a.startswith("-") and path == ".":
+                path = a
+                i += 1
+                continue
+            if a == "-name" and i + 1 < len(args):
+                name_pat = args[i + 1]
+                i += 2
+                continue
+            if a == "-type" and i + 1 < len(args):
+                val = args[i + 1]
+                if val not in ("f", "d"):
+                    self.writeln("find: -type ожидает f или d")
                     return False
-                if name_pat is not None and not fnmatch.fnmatch(node.name, name_pat):
+                type_filter = val
+                i += 2
+                continue
+            if a == "-maxdepth" and i + 1 < len(args):
+                try:
+                    maxdepth = int(args[i + 1])
+                    if maxdepth < 0:
+                        raise ValueError
+                except ValueError:
+                    self.writeln("find: -maxdepth ожидает неотрицательное целое")
                     return False
-                return True
-
-            for node, depth in _walk_vfs(start_node, maxdepth=maxdepth):
-                if match(node):
-                    self.writeln(node.abspath())
-            return True
-
-        if cmd == "cd":
-            path = args[0] if args else "/"
-            try:
-                target = _resolve_in_vfs(self.cwd, self.vfs_root, path)
-            except (FileNotFoundError, ValueError) as e:
-                self.writeln(f"cd: {e}")
-                return False
-            if not isinstance(target, VDir):
-                self.writeln(f"cd: не каталог: {path}")
-                return False
-            self.cwd = target
-            return True
+                i += 2
+                continue
+            self.writeln(f"find: неизвестная опция или аргумент '{a}'")
+            return False
 
-        if cmd == "touch":
-            if not args:
-                self.writeln("usage: touch FILE...")
-                return False
-            ok_all = True
-            for p in args:
-                try:
-                    node = _resolve_in_vfs(self.cwd, self.vfs_root, p)
-                except (FileNotFoundError, ValueError):
-                    # Создаём новый пустой файл
-                    try:
-                        parent, name = _resolve_parent_for_creation(self.cwd, self.vfs_root, p)
-                        parent.add_file(name, b"")
-                    except (FileNotFoundError, ValueError) as e:
-                        self.writeln(f"touch: {e}")
-                        ok_all = False
-                else:
-                    if isinstance(node, VDir):
-                        self.writeln(f"touch: нельзя применить к каталогу: {p}")
-                        ok_all = False
-                    # файл уже существует — ничего не делаем
-            return ok_all
-
-        if cmd == "cp":
-            recursive = False
-            rest = []
-            for a in args:
-                if a == "-r":
-                    recursive = True
-                else:
-                    rest.append(a)
-            if len(rest) != 2:
-                self.writeln("usage: cp [-r] SRC DST")
-                return False
-            src_path, dst_path = rest
-            # Разрешаем источник
-            try:
-                src_node = _resolve_in_vfs(self.cwd, self.vfs_root, src_path)
-            except (FileNotFoundError, ValueError) as e:
-                self.writeln(f"cp: источник не найден: {e}")
-                return False
+        try:
+            start_node = self._cached_resolve(path)
+        except (FileNotFoundError, ValueError) as e:
+            self.writeln(f"find: {e}")
+            return False
 
-            if isinstance(src_node, VDir) and not recursive:
-                self.writeln("cp: для копирования каталогов используйте -r")
-                return False
+        # Предикат собираем один раз только из заданных условий,
+        # маску компилируем один раз на весь обход
+        checks: list[Callable[[VNode], bool]] = []
+        if type_filter == "f":
+            checks.append(lambda node: isinstance(node, VFile))
+        elif type_filter == "d":
+            checks.append(lambda node: isinstance(node, VDir))
+        if name_pat is not None:
+            # normcase с обеих сторон, как в fnmatch.fnmatch (на Windows — без учёта регистра)
+            normcase = os.path.normcase
+            name_re = re.compile(fnmatch.translate(normcase(name_pat))).match
+            checks.append(lambda node: name_re(normcase(node.name)) is not None)
+
+        walk = _walk_vfs(start_node, maxdepth=maxdepth)
+        if not checks:
+            found = [node.abspath() for node, _depth in walk]
+        else:
+            if len(checks) == 1:
+                match = checks[0]
+            else:
+                first, second = checks
+                match = lambda node: first(node) and second(node)  # noqa: E731
+            found = [node.abspath() for node, _depth in walk if match(node)]
+        if found:
+            self.writeln("\n".join(found))
+        return True
+
+    def _cmd_cd(self, args: list[str]) -> bool:
+        path = args[0] if args else "/"
+        try:
+            target = self._cached_resolve(path)
+        except (FileNotFoundError, ValueError) as e:
+            self.writeln(f"cd: {e}")
+            return False
+        if not isinstance(target, VDir):
+            self.writeln(f"cd: не каталог: {path}")
+            return False
+        self.cwd = target
+        return True
 
-            # Пытаемся понять, существует ли назначение
+    def _cmd_touch(self, args: list[str]) -> bool:
+        if not args:
+            self.writeln("usage: touch FILE...")
+            return False
+        ok_all = True
+        for p in args:
             try:
-                dst_node = _resolve_in_vfs(self.cwd, self.vfs_root, dst_path)
-                dst_exists = True
+                node = self._cached_resolve(p)
             except (FileNotFoundError, ValueError):
-                dst_node = None
-                dst_exists = False
+                # Создаём новый пустой файл
+                try:
+                    parent, name = _resolve_parent_for_creation(self.cwd, self.vfs_root, p)
+                    parent.add_file(name, b"")
+                except (FileNotFoundError, ValueError) as e:
+                    self.writeln(f"touch: {e}")
+                    ok_all = False
+            else:
+                if isinstance(node, VDir):
+                    self.writeln(f"touch: нельзя применить к каталогу: {p}")
+                    ok_all = False
+                # файл уже существует — ничего не делаем
+        return ok_all
+
+    def _cmd_cp(self, args: list[str]) -> bool:
+        recursive = False
+        rest = []
+        for a in args:
+            if a == "-r":
+                recursive = True
+            else:
+                rest.append(a)
+        if len(rest) != 2:
+            self.writeln("usage: cp [-r] SRC DST")
+            return False
+        src_path, dst_path = rest
+        # Разрешаем источник
+        try:
+            src_node = self._cached_resolve(src_path)
+        except (FileNotFoundError, ValueError) as e:
+            self.writeln(f"cp: источник не найден: {e}")
+            return False
 
-            try:
-                if dst_exists:
-                    if isinstance(dst_node, VFile):
-                        if isinstance(src_node, VDir):
-                            self.writeln("cp: нельзя копировать каталог в файл")
-                            return False
-                        # Перезапись файла
-                        dst_node.content = src_node.content  # type: ignore[attr-defined]
-                        return True
-                    else:
-                        # dst — каталог: копируем внутрь под исходным именем
-                        target_parent = dst_node  # type: ignore[assignment]
-                        new_name = src_node.name
-                        # Защитимся от нежелательного слияния каталогов
-                        if isinstance(src_node, VDir) and target_parent.get(new_name) is not None:
-                            self.writeln(f"cp: цель уже существует: {target_parent.abspath().rstrip('/')}/{new_name}")
-                            return False
-                        _copy_recursive(src_node, target_parent, new_name)
-                        return True
+        if isinstance(src_node, VDir) and not recursive:
+            self.writeln("cp: для копирования каталогов используйте -r")
+            return False
+
+        try:
+            # Один проход по пути: существующее назначение или (родитель, имя) для создания
+            dst_node, parent, name = _resolve_or_parent(self.cwd, self.vfs_root, dst_path)
+            if dst_node is not None:
+                if isinstance(dst_node, VFile):
+                    if isinstance(src_node, VDir):
+                        self.writeln("cp: нельзя копировать каталог в файл")
+                        return False
+                    # Перезапись файла
+                    dst_node.content = src_node.content  # type: ignore[attr-defined]
+                    return True
                 else:
-                    # Назначение не существует — создаём по указанному пути
-                    parent, name = _resolve_parent_for_creation(self.cwd, self.vfs_root, dst_path)
-                    if isinstance(src_node, VDir) and parent.get(name) is not None:
-                        self.writeln(f"cp: цель уже существует: {parent.abspath().rstrip('/')}/{name}")
+                    # dst — каталог: копируем внутрь под исходным именем
+                    target_parent = dst_node  # type: ignore[assignment]
+                    new_name = src_node.name
+                    # Защитимся от нежелательного слияния каталогов
+                    if isinstance(src_node, VDir) and target_parent.get(new_name) is not None:
+                        self.writeln(f"cp: цель уже существует: {target_parent.abspath().rstrip('/')}/{new_name}")
                         return False
-                    _copy_recursive(src_node, parent, name)
+                    _copy_recursive(src_node, target_parent, new_name)
                     return True
-            except (FileNotFoundError, ValueError) as e:
-                self.writeln(f"cp: {e}")
-                return False
-
-        # неизвестная команда — считаем ошибкой (важно для остановки скрипта)
-        self.writeln(f"{cmd}: команда не найдена")
-        return False
+            else:
+                # Назначение не существует — создаём по указанному пути
+                if isinstance(src_node, VDir) and parent.get(name) is not None:
+                    self.writeln(f"cp: цель уже существует: {parent.abspath().rstrip('/')}/{name}")
+                    return False
+                _copy_recursive(src_node, parent, name)
+                return True
+        except (FileNotFoundError, ValueError) as e:
+            self.writeln(f"cp: {e}")
+            return False
 
 
 def parse_args(argv: list[str]) -> argparse.Namespace:
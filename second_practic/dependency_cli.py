@@ -2,37 +2,43 @@
 """Stage 5 CLI prototype for the dependency visualization tool."""
 
 import argparse
+import codecs
+import re
+import stat
 import sys
 from collections import deque
-from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-from typing import Callable, Iterable
+from typing import Callable, Iterable, NamedTuple
 from urllib.parse import urlparse
-from urllib.request import urlopen
 
-import tomllib
+
+# '-'-separated chunks of letters, digits and '_', each with at least one letter or digit
+_PACKAGE_NAME_RE = re.compile(r"_*[^\W_]\w*(?:-_*[^\W_]\w*)*")
+_VERSION_RE = re.compile(r"\d+\.\d+(?:\.\d+)*")
 
 
 def package_name(value: str) -> str:
     name = value.strip()
     if not name:
         raise argparse.ArgumentTypeError("package name must not be empty")
-    for chunk in name.split("-"):
-        if not chunk.replace("_", "").isalnum():
-            raise argparse.ArgumentTypeError(
-                "package name may only contain letters, digits, '_' or '-'"
-            )
+    if not _PACKAGE_NAME_RE.fullmatch(name):
+        raise argparse.ArgumentTypeError(
+            "package name may only contain letters, digits, '_' or '-'"
+        )
     return name
 
 
 def version_string(value: str) -> str:
     text = value.strip()
-    parts = text.split(".")
-    if len(parts) < 2:
+    if _VERSION_RE.fullmatch(text):
+        return text
+    if "." not in text:
         raise argparse.ArgumentTypeError(
             "version must contain at least major and minor parts, e.g. 1.0"
         )
-    if not all(part.isdigit() for part in parts):
+    # \d covers Unicode decimals only; str.isdigit also accepts e.g. superscripts
+    if not all(part.isdigit() for part in text.split(".")):
         raise argparse.ArgumentTypeError("version must contain only digits and dots")
     return text
 
@@ -104,10 +110,11 @@ def parse_args(argv: list[str]) -> argparse.Namespace:
         if not is_url(args.repository):
             parser.error("--repository must be a valid URL when --test-mode is 'real'")
     else:
-        path = Path(args.repository)
-        if not path.exists():
+        try:
+            mode = Path(args.repository).stat().st_mode
+        except (OSError, ValueError):
             parser.error("test repository file not found")
-        if not path.is_file():
+        if not stat.S_ISREG(mode):
             parser.error("test repository path must point to a file")
 
     if args.filter_substring is not None and args.filter_substring.strip() == "":
@@ -121,59 +128,156 @@ def is_url(value: str) -> bool:
     return bool(parsed.scheme and parsed.netloc)
 
 
-@dataclass
-class DirectDependency:
+EdgeKey = tuple[str, str | None]
+EdgeTargets = list[tuple[str, str | None]]
+GraphEdges = dict[EdgeKey, EdgeTargets]
+
+
+class DirectDependency(NamedTuple):
     name: str
     requirement: str
 
 
-@dataclass
-class GraphEntry:
+class GraphEntry(NamedTuple):
     name: str
     version: str | None
     depth: int
+    key: EdgeKey  # (name.lower(), version), the node's key in GraphEdges
 
 
-EdgeKey = tuple[str, str | None]
-EdgeTargets = list[tuple[str, str | None]]
-GraphEdges = dict[EdgeKey, EdgeTargets]
+DependencyProvider = Callable[[str, str | None], tuple[DirectDependency, ...]]
 
 
 def load_manifest(path: str, mode: str) -> dict:
     try:
         if mode == "real":
-            return tomllib.loads(read_url(path))
-        return tomllib.loads(Path(path).read_text(encoding="utf-8"))
+            content = read_url(path)
+        else:
+            content = Path(path).read_text(encoding="utf-8")
     except FileNotFoundError as exc:
         raise RuntimeError(f"cannot read manifest file: {path}") from exc
     except OSError as exc:
         raise RuntimeError(f"failed to read manifest: {exc}") from exc
-    except tomllib.TOMLDecodeError as exc:
+    return parse_manifest(content)
+
+
+def parse_manifest(content: str) -> dict:
+    try:
+        from rtoml import loads
+    except ImportError:  # optional: fall back to the stdlib tomllib parser
+        from tomllib import loads
+    try:
+        return loads(content)
+    except ValueError as exc:  # tomllib.TOMLDecodeError / rtoml.TomlParsingError
         raise RuntimeError(f"invalid Cargo.toml format: {exc}") from exc
 
 
+@lru_cache(maxsize=None)
+def _http_pool(proxy: str | None):
+    # Keep-alive connection pool shared by all fetches (only when urllib3 is installed)
+    try:
+        import urllib3
+    except ImportError:  # optional: fall back to urllib.request
+        return None
+    # Redirects get urlopen's limit of 10; every other failure kind is capped too,
+    # so TLS and proxy-tunnel errors ("other") cannot be retried forever
+    retries = urllib3.Retry(
+        total=13, connect=3, read=3, redirect=10, other=3, backoff_factor=0.2
+    )
+    if proxy is None:
+        return urllib3.PoolManager(maxsize=8, retries=retries)
+    if "://" not in proxy:  # urlopen also accepts bare host:port proxies
+        proxy = f"http://{proxy}"
+    parsed = urlparse(proxy)
+    userinfo, _, hostport = parsed.netloc.rpartition("@")
+    proxy_headers = None
+    if userinfo:
+        # ProxyManager ignores user:pass@ in the URL; send it as urlopen does
+        from urllib.parse import unquote
+
+        user, _, password = userinfo.partition(":")
+        proxy_headers = urllib3.make_headers(
+            proxy_basic_auth=f"{unquote(user)}:{unquote(password)}"
+        )
+        proxy = parsed._replace(netloc=hostport).geturl()
+    return urllib3.ProxyManager(
+        proxy, maxsize=8, retries=retries, proxy_headers=proxy_headers
+    )
+
+
+def _proxy_for(parsed) -> str | None:
+    # Honour http_proxy/https_proxy/no_proxy the same way urlopen does
+    from urllib.request import getproxies, proxy_bypass
+
+    proxy = getproxies().get(parsed.scheme)
+    if proxy is None or (parsed.hostname and proxy_bypass(parsed.hostname)):
+        return None
+    return proxy
+
+
+# Manifest bodies are decoded incrementally in chunks of this size
+_READ_CHUNK_SIZE = 1 << 16
+
+
 def read_url(url: str) -> str:
+    parsed = urlparse(url)
+    if parsed.scheme in ("http", "https"):
+        pool = _http_pool(_proxy_for(parsed))
+        if pool is not None:
+            return _read_url_pooled(pool, url)
+
+    from urllib.request import urlopen
+
     try:
         with urlopen(url) as response:  # type: ignore[arg-type]
-            data = response.read()
+            return _decode_response(response)
     except OSError as exc:  # network failure or unreachable host
         raise RuntimeError(f"failed to fetch manifest from URL: {exc}") from exc
+
+
+def _decode_response(response) -> str:
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    parts: list[str] = []
     try:
-        return data.decode("utf-8")
+        while chunk := response.read(_READ_CHUNK_SIZE):
+            parts.append(decoder.decode(chunk))
+        parts.append(decoder.decode(b"", final=True))
     except UnicodeDecodeError as exc:
         raise RuntimeError("manifest must be utf-8 encoded") from exc
+    return "".join(parts)
+
 
+def _read_url_pooled(pool, url: str) -> str:
+    from urllib3.exceptions import HTTPError
 
-def extract_direct_dependencies(manifest: dict) -> list[DirectDependency]:
+    try:
+        response = pool.request(
+            "GET",
+            url,
+            preload_content=False,
+            headers={"Accept-Encoding": "gzip, deflate"},
+        )
+        try:
+            if response.status >= 400:
+                raise RuntimeError(
+                    f"failed to fetch manifest from URL: HTTP Error {response.status}: {response.reason}"
+                )
+            return _decode_response(response)
+        finally:
+            response.release_conn()
+    except HTTPError as exc:  # network failure or unreachable host
+        raise RuntimeError(f"failed to fetch manifest from URL: {exc}") from exc
+
+
+def extract_direct_dependencies(manifest: dict) -> tuple[DirectDependency, ...]:
     deps_section = manifest.get("dependencies", {})
     if not isinstance(deps_section, dict):
-        return []
+        return ()
 
-    dependencies: list[DirectDependency] = []
-    for name, spec in deps_section.items():
-        requirement = dependency_requirement(spec)
-        dependencies.append(DirectDependency(name=name, requirement=requirement))
-    return dependencies
+    return tuple(
+        DirectDependency(name=name, requirement=dependency_requirement(spec))
+        for name, spec in deps_section.items()
+    )
 
 
 def dependency_requirement(spec: object) -> str:
@@ -206,21 +310,25 @@ def validate_manifest(manifest: dict, *, expected_name: str, expected_version: s
 
 
 def print_configuration(parameters: dict[str, object]) -> None:
+    out: list[str] = []
     for key, value in parameters.items():
         if value is None or value == "":
-            print(f"{key}: <not set>")
+            out.append(f"{key}: <not set>\n")
         else:
-            print(f"{key}: {value}")
+            out.append(f"{key}: {value}\n")
+    sys.stdout.write("".join(out))
 
 
 def print_dependencies(dependencies: Iterable[DirectDependency]) -> None:
-    deps = list(dependencies)
-    if not deps:
+    deps = iter(dependencies)
+    first = next(deps, None)
+    if first is None:
         print("Direct dependencies: <none>")
         return
-    print("Direct dependencies:")
+    out = ["Direct dependencies:\n", f"- {first.name}: {first.requirement}\n"]
     for dep in deps:
-        print(f"- {dep.name}: {dep.requirement}")
+        out.append(f"- {dep.name}: {dep.requirement}\n")
+    sys.stdout.write("".join(out))
 
 
 def read_test_repository(path: Path) -> tuple[str, str]:
@@ -240,28 +348,22 @@ def read_test_repository(path: Path) -> tuple[str, str]:
 
 def parse_graph_definition(text: str) -> dict[str, list[str]]:
     graph: dict[str, list[str]] = {}
-    referenced: set[str] = set()
     for idx, raw_line in enumerate(text.splitlines(), start=1):
         line = raw_line.strip()
-        if not line or line.startswith("#"):
+        if not line or line[0] == "#":
             continue
-        if ":" not in line:
+        name, sep, remainder = line.partition(":")
+        if not sep:
             raise RuntimeError(f"line {idx}: expected 'PACKAGE:DEP1,DEP2' format")
-        name, remainder = line.split(":", 1)
         package = name.strip()
         if not package:
             raise RuntimeError(f"line {idx}: package name is empty")
-        deps = []
-        for chunk in remainder.split(","):
-            dep = chunk.strip()
-            if dep:
-                deps.append(dep)
-                referenced.add(dep)
+        deps = [dep for chunk in remainder.split(",") if (dep := chunk.strip())]
+        for dep in deps:
+            graph.setdefault(dep, [])
+        # assigned after the deps so a self-reference or earlier mention is overwritten
         graph[package] = deps
 
-    for dep in referenced:
-        graph.setdefault(dep, [])
-
     if not graph:
         raise RuntimeError("graph definition is empty")
 
@@ -270,71 +372,90 @@ def parse_graph_definition(text: str) -> dict[str, list[str]]:
 
 def create_manifest_provider(
     root_name: str, root_version: str, manifest: dict
-) -> tuple[list[DirectDependency], Callable[[str, str | None], list[DirectDependency]]]:
+) -> tuple[tuple[DirectDependency, ...], DependencyProvider]:
+    # A single manifest only describes the root, so the same tuple is both the
+    # printed dependency list and the provider's only non-empty answer.
     direct = extract_direct_dependencies(manifest)
-    cache: dict[tuple[str, str | None], list[DirectDependency]] = {
-        (root_name.lower(), root_version): direct
-    }
+    root_lower = root_name.lower()
 
-    def provider(name: str, version: str | None) -> list[DirectDependency]:
-        return cache.get((name.lower(), version), [])
+    def provider(name: str, version: str | None) -> tuple[DirectDependency, ...]:
+        if version == root_version and (name == root_name or name.lower() == root_lower):
+            return direct
+        return ()
 
     return direct, provider
 
 
-def create_graph_provider(graph: dict[str, list[str]]) -> Callable[[str, str | None], list[DirectDependency]]:
-    def provider(name: str, version: str | None) -> list[DirectDependency]:
-        return [DirectDependency(dep, "<graph>") for dep in graph.get(name, [])]
+def create_graph_provider(graph: dict[str, list[str]]) -> DependencyProvider:
+    def provider(name: str, version: str | None) -> tuple[DirectDependency, ...]:
+        return tuple(DirectDependency(dep, "<graph>") for dep in graph.get(name, ()))
 
     return provider
 
 
-def should_filter(name: str, substring: str | None) -> bool:
-    if not substring:
+def should_filter(name_lower: str, substring_lower: str | None) -> bool:
+    if not substring_lower:
         return False
-    return substring.lower() in name.lower()
+    return substring_lower in name_lower
 
 
 def build_dependency_graph(
     root_name: str,
     root_version: str | None,
-    provider: Callable[[str, str | None], list[DirectDependency]],
+    provider: DependencyProvider,
     *,
     max_depth: int,
     filter_substring: str | None,
 ) -> tuple[list[GraphEntry], GraphEdges, list[str]]:
-    queue: deque[tuple[str, str | None, int]] = deque([(root_name, root_version, 0)])
-    visited: set[tuple[str, str | None]] = set()
+    # Nodes are marked visited when queued, so every frontier holds each package
+    # once (in first-seen order) instead of one copy per incoming edge. Visited
+    # and per-parent dedup sets hold flat "name\0version" strings, not tuples.
+    root_lower = sys.intern(root_name.lower())
+    root = GraphEntry(root_name, root_version, 0, (root_lower, root_version))
+    frontier: list[GraphEntry] = [root]
+    substring_lower = filter_substring.lower() if filter_substring else None
+    visited: set[str] = {root_lower + "\0" + (root_version or "")}
     entries: list[GraphEntry] = []
     edges: GraphEdges = {}
     skipped: list[str] = []
 
-    while queue:
-        name, version, depth = queue.popleft()
-        key = (name.lower(), version)
-        if key in visited:
-            continue
-        visited.add(key)
-        entries.append(GraphEntry(name, version, depth))
-
-        dependencies = provider(name, version)
-        children: list[tuple[str, str | None]] = []
-        seen_child_keys: set[tuple[str, str | None]] = set()
-        if depth < max_depth:
+    while frontier:
+        entries.extend(frontier)
+        if frontier[0].depth >= max_depth:
+            # the last level is never expanded, so it needs no provider lookups
+            for entry in frontier:
+                edges[entry.key] = []
+            break
+
+        next_frontier: list[GraphEntry] = []
+        for entry in frontier:
+            dependencies = provider(entry.name, entry.version)
+            children: list[tuple[str, str | None]] = []
+            seen_child_keys: set[str] = set()
             for dep in dependencies:
-                if should_filter(dep.name, filter_substring):
+                name_lower = sys.intern(dep.name.lower())
+                if should_filter(name_lower, substring_lower):
                     skipped.append(dep.name)
                     continue
                 version_value = dep.requirement if dep.requirement else None
                 if version_value and version_value.startswith("<"):
                     version_value = None
-                child_key = (dep.name, version_value)
-                normalized = (dep.name.lower(), version_value)
-                if normalized not in seen_child_keys:
-                    seen_child_keys.add(normalized)
-                    children.append(child_key)
-                queue.append((dep.name, version_value, depth + 1))
-        edges[(name.lower(), version)] = children
+                visit_key = name_lower + "\0" + (version_value or "")
+                if visit_key not in seen_child_keys:
+                    seen_child_keys.add(visit_key)
+                    children.append((dep.name, version_value))
+                if visit_key not in visited:
+                    visited.add(visit_key)
+                    next_frontier.append(
+                        GraphEntry(
+                            dep.name,
+                            version_value,
+                            entry.depth + 1,
+                            (name_lower, version_value),
+                        )
+                    )
+            edges[entry.key] = children
+        frontier = next_frontier
 
     return entries, edges, skipped
 
@@ -354,33 +475,37 @@ def print_graph(
     max_depth: int,
     skipped: Iterable[str],
 ) -> None:
-    print(f"Resolved dependency graph (depth limit {max_depth}):")
+    out = [f"Resolved dependency graph (depth limit {max_depth}):\n"]
+    # shared dependencies appear under many parents; format each label once
+    labels: dict[tuple[str, str | None], str] = {}
     for entry in entries:
         label = format_label(entry.name, entry.version)
-        children = edges.get((entry.name.lower(), entry.version), [])
+        children = edges.get(entry.key, [])
         if children:
-            formatted_children = ", ".join(
-                format_label(child_name, child_version)
-                for child_name, child_version in children
-            )
-            print(f"- depth {entry.depth}: {label} -> {formatted_children}")
+            child_labels: list[str] = []
+            for child in children:
+                child_label = labels.get(child)
+                if child_label is None:
+                    child_label = labels[child] = format_label(*child)
+                child_labels.append(child_label)
+            formatted_children = ", ".join(child_labels)
+            out.append(f"- depth {entry.depth}: {label} -> {formatted_children}\n")
         else:
-            print(f"- depth {entry.depth}: {label} -> <none>")
+            out.append(f"- depth {entry.depth}: {label} -> <none>\n")
 
     skipped_set = {name for name in skipped}
     if skipped_set:
-        print("Skipped by filter:")
+        out.append("Skipped by filter:\n")
         for name in sorted(skipped_set):
-            print(f"- {name}")
+            out.append(f"- {name}\n")
+    sys.stdout.write("".join(out))
 
 
 def calculate_load_order(
     entries: Iterable[GraphEntry],
     edges: GraphEdges,
 ) -> tuple[list[str], list[str], list[str]]:
-    entry_lookup: dict[EdgeKey, GraphEntry] = {
-        (entry.name.lower(), entry.version): entry for entry in entries
-    }
+    entry_lookup: dict[EdgeKey, GraphEntry] = {entry.key: entry for entry in entries}
     display_names: dict[str, str] = {}
     adjacency: dict[str, list[str]] = {}
     indegree: dict[str, int] = {}
@@ -389,7 +514,7 @@ def calculate_load_order(
     fallback_seen: set[str] = set()
 
     for entry in entries:
-        key = entry.name.lower()
+        key = entry.key[0]
         if key not in display_names:
             display_names[key] = format_label(entry.name, entry.version)
         adjacency.setdefault(key, [])
@@ -475,9 +600,7 @@ def print_load_order(
 
 def generate_mermaid(entries: Iterable[GraphEntry], edges: GraphEdges) -> str:
     node_ids: dict[EdgeKey, str] = {}
-    entry_lookup: dict[EdgeKey, GraphEntry] = {
-        (entry.name.lower(), entry.version): entry for entry in entries
-    }
+    entry_lookup: dict[EdgeKey, GraphEntry] = {entry.key: entry for entry in entries}
 
     lines: list[str] = ["graph TD"]
 
@@ -519,12 +642,10 @@ def print_ascii_tree(
     root_version: str | None,
     mode: str,
 ) -> None:
-    entry_lookup: dict[EdgeKey, GraphEntry] = {
-        (entry.name.lower(), entry.version): entry for entry in entries
-    }
+    entry_lookup: dict[EdgeKey, GraphEntry] = {entry.key: entry for entry in entries}
     root_key: EdgeKey = (root_name.lower(), root_version)
     if root_key not in entry_lookup:
-        entry_lookup[root_key] = GraphEntry(root_name, root_version, 0)
+        entry_lookup[root_key] = GraphEntry(root_name, root_version, 0, root_key)
 
     print(f"ASCII tree ({mode}):")
 
@@ -598,7 +719,7 @@ def main(argv: list[str]) -> int:
         else:
             kind, content = read_test_repository(Path(args.repository))
             if kind == "manifest":
-                manifest = tomllib.loads(content)
+                manifest = parse_manifest(content)
                 validate_manifest(
                     manifest,
                     expected_name=args.package,
@@ -614,9 +735,9 @@ def main(argv: list[str]) -> int:
                     raise RuntimeError(
                         f"root package '{args.package}' is not defined in test graph"
                     )
-                dependencies = [
-                    DirectDependency(dep, "<graph>") for dep in graph.get(args.package, [])
-                ]
+                dependencies = tuple(
+                    DirectDependency(dep, "<graph>") for dep in graph[args.package]
+                )
                 provider = create_graph_provider(graph)
                 root_version = None
 